@@ -1,14 +1,29 @@
+import time
+_BOOT_T0 = time.perf_counter()
+
 import os
+import asyncio
+import gzip
+import json
+import hashlib
+import itertools
 import logging
-from threading import Thread
-from flask import Flask
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
+import random
+import re
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from functools import wraps
+from threading import Thread, Lock
+from urllib.parse import quote
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import BadRequest
+from telegram.request import HTTPXRequest
 from telegram.ext import (
     Application,
     CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
+    TypeHandler,
     filters,
     ContextTypes
 )
@@ -25,6 +40,15 @@ logger = logging.getLogger(__name__)
 logging.getLogger('httpx').setLevel(logging.WARNING)
 logging.getLogger('telegram').setLevel(logging.WARNING)
 
+# =====================================
+# STARTUP TIMELINE
+# =====================================
+def mark_startup(stage):
+    """Log waktu sejak proses mulai, untuk mengukur cold start."""
+    logger.info(f"[startup] +{(time.perf_counter() - _BOOT_T0) * 1000:.0f} ms {stage}")
+
+mark_startup("imports selesai")
+
 # =====================================
 # ENVIRONMENT
 # =====================================
@@ -33,6 +57,10 @@ ADMIN_IDS = os.environ.get('ADMIN_IDS', '').strip()
 DATABASE_CHANNEL = os.environ.get('DATABASE_CHANNEL', '').strip()
 PORT = int(os.environ.get('PORT', 10000))
 QRIS_URL = os.environ.get('QRIS_URL', '').strip()  # URL foto QRIS
+CALLBACK_DEBOUNCE = float(os.environ.get('CALLBACK_DEBOUNCE', 0.3))  # detik, untuk tombol navigasi
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 1.0))  # 0..1, saat tracing aktif
+SLOW_UPDATE_MS = float(os.environ.get('SLOW_UPDATE_MS', 1000))
+PROFILE_SECONDS = int(os.environ.get('PROFILE_SECONDS', 30))
 
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN tidak boleh kosong!")
@@ -60,37 +88,228 @@ if DATABASE_CHANNEL:
     except:
         logger.warning("DATABASE_CHANNEL format salah")
 
+# SNAPSHOT FILE (opsional, untuk backup / disaster recovery)
+CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH', 'catalog.json.gz').strip()
+CATALOG_SAVE_DELAY = float(os.environ.get('CATALOG_SAVE_DELAY', 5))  # detik, batching simpan snapshot
+
 # MEMORY DB
+# drama_database adalah snapshot katalog yang sudah dipublish dan TIDAK BOLEH
+# dimutasi. Pembaca mengambil referensinya sekali per request (get_catalog),
+# penulis membuat salinan lalu menukarnya lewat swap_catalog.
+# Snapshot file dimuat lazy supaya polling bisa mulai secepat mungkin.
 drama_database = {}
+_catalog_loaded = False
+_catalog_lock = Lock()
+_export_lock = Lock()
+_catalog_dirty = False
+_catalog_save_task = None
+_catalog_flush_lock = asyncio.Lock()
+
+
+# =====================================
+# CATALOG SNAPSHOT (COPY-ON-WRITE)
+# =====================================
+SNAPSHOT_VERSION = 1
+
+def get_catalog():
+    """Ambil snapshot katalog saat ini. Pin sekali per request, jangan dimutasi."""
+    if not _catalog_loaded:
+        load_catalog_lazily()
+    return drama_database
+
+def swap_catalog(new_catalog):
+    """Publish snapshot baru secara atomik (rebind satu referensi global)."""
+    global drama_database, _catalog_loaded
+    with _catalog_lock:
+        drama_database = new_catalog
+        _catalog_loaded = True
+    return new_catalog
+
+def load_catalog_lazily():
+    """Muat snapshot file sekali saja; dipanggil saat akses pertama atau prewarm."""
+    global drama_database, _catalog_loaded
+    with _catalog_lock:
+        if _catalog_loaded:
+            return
+        if CATALOG_SNAPSHOT_PATH and os.path.exists(CATALOG_SNAPSHOT_PATH):
+            try:
+                drama_database = load_catalog_file()
+            except Exception as e:
+                logger.warning(f"Gagal memuat snapshot: {e}")
+        _catalog_loaded = True
+    mark_startup(f"katalog dimuat ({len(drama_database)} drama)")
+
+def update_drama(drama_id, title=None, episode=None, file_id=None, thumbnail=None):
+    """
+    Copy-on-write update untuk satu drama: salin dict top-level dan entry
+    drama yang berubah, lalu swap. Snapshot lama tetap utuh untuk pembaca
+    yang sedang iterasi. Tidak ada await di sini, jadi aman di event loop.
+    """
+    old = get_catalog()
+    old_info = old.get(drama_id)
+
+    info = dict(old_info) if old_info else {"title": title, "episodes": {}}
+    info["episodes"] = dict(info.get("episodes", {}))
+
+    if title is not None:
+        info["title"] = title
+    if episode is not None:
+        info["episodes"][episode] = {"file_id": file_id}
+    if thumbnail is not None:
+        info["thumbnail"] = thumbnail
+
+    new = dict(old)
+    new[drama_id] = info
+    return swap_catalog(new)
+
+def build_catalog(dramas):
+    """Bangun snapshot baru di samping snapshot aktif (untuk bulk import/backfill)."""
+    catalog = {}
+    for did, info in dramas.items():
+        episodes = {
+            str(ep): {"file_id": e["file_id"]}
+            for ep, e in (info.get("episodes") or {}).items()
+            if e and e.get("file_id")
+        }
+        entry = {"title": info.get("title") or did, "episodes": episodes}
+        if info.get("thumbnail"):
+            entry["thumbnail"] = info["thumbnail"]
+        catalog[str(did)] = entry
+    return catalog
+
+SNAPSHOT_FILENAME = 'catalog.json.gz'  # nama file yang dikenali restore_snapshot
+
+def dump_catalog(catalog):
+    """Serialisasi snapshot ke bytes gzip JSON ringkas."""
+    payload = json.dumps(
+        {"v": SNAPSHOT_VERSION, "dramas": catalog},
+        ensure_ascii=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+    return gzip.compress(payload, compresslevel=6)
+
+def export_catalog(path=None, catalog=None):
+    """Tulis snapshot ke file (atomic via os.replace)."""
+    path = path or CATALOG_SNAPSHOT_PATH
+    catalog = get_catalog() if catalog is None else catalog
+    data = dump_catalog(catalog)
+
+    tmp_path = f"{path}.tmp"
+    with _export_lock:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
+
+def load_catalog_file(path=None):
+    """Baca file snapshot dan kembalikan katalog baru (belum di-swap)."""
+    path = path or CATALOG_SNAPSHOT_PATH
+    with gzip.open(path, 'rb') as f:
+        data = json.loads(f.read().decode('utf-8'))
+    if data.get("v") != SNAPSHOT_VERSION:
+        raise ValueError(f"Versi snapshot tidak didukung: {data.get('v')}")
+    return build_catalog(data.get("dramas") or {})
+
+def mark_catalog_dirty():
+    """
+    Tandai katalog berubah. Snapshot ditulis di background setelah
+    CATALOG_SAVE_DELAY, jadi forward beruntun cukup disimpan sekali.
+    """
+    global _catalog_dirty, _catalog_save_task
+    if not CATALOG_SNAPSHOT_PATH:
+        return
+    _catalog_dirty = True
+    if _catalog_save_task is None or _catalog_save_task.done():
+        _catalog_save_task = asyncio.get_running_loop().create_task(flush_catalog_later())
+
+async def flush_catalog_later():
+    # Task ini menyalin context handler; jangan ikut mengisi trace update itu
+    _current_trace.set(None)
+    await asyncio.sleep(CATALOG_SAVE_DELAY)
+    await flush_catalog()
+
+async def flush_catalog():
+    """
+    Tulis snapshot yang di-pin di thread terpisah selama masih dirty.
+    Flush diserialisasi, jadi setelah await selesai file sudah terbaru.
+    """
+    global _catalog_dirty
+    async with _catalog_flush_lock:
+        while _catalog_dirty:
+            _catalog_dirty = False
+            snapshot = get_catalog()
+            try:
+                await asyncio.to_thread(export_catalog, None, snapshot)
+            except Exception as e:
+                logger.warning(f"export_catalog failed: {e}")
 
 # =====================================
 # FLASK SERVER
 # =====================================
-app = Flask(__name__)
+def create_flask_app():
+    # Import Flask di thread server, bukan di jalur startup bot
+    from flask import Flask
+
+    app = Flask(__name__)
+
+    @app.route('/')
+    def home():
+        return {
+            'status': 'online',
+            'dramas': len(get_catalog())
+        }
 
-@app.route('/')
-def home():
-    return {
-        'status': 'online',
-        'dramas': len(drama_database)
-    }
+    return app
 
 def run_flask():
+    app = create_flask_app()
+    mark_startup("flask siap")
     app.run(host='0.0.0.0', port=PORT, debug=False, use_reloader=False)
 
 
 # =====================================
 # HELPERS: SAFE EDIT / REPLY
 # =====================================
+# Render terakhir per pesan, untuk melewati edit yang hasilnya sama
+_last_rendered = OrderedDict()
+LAST_RENDERED_MAX = 2048
+
+def message_key(message):
+    if not message:
+        return None
+    return (message.chat_id, message.message_id)
+
+def render_signature(text, reply_markup, parse_mode):
+    return (text, parse_mode, reply_markup.to_json() if reply_markup else None)
+
+def remember_render(key, signature):
+    _last_rendered[key] = signature
+    _last_rendered.move_to_end(key)
+    while len(_last_rendered) > LAST_RENDERED_MAX:
+        _last_rendered.popitem(last=False)
+
 async def safe_edit_or_reply(query, text, reply_markup=None, parse_mode=None):
     """
     Try to edit the message text. If the original message is media (no text),
     fallback to sending a new text message and try to delete the old message.
+    Edits whose output equals what the message already shows are skipped.
     """
+    key = message_key(query.message)
+    signature = render_signature(text, reply_markup, parse_mode)
+    if key is not None and _last_rendered.get(key) == signature:
+        logger.debug("edit skipped: output unchanged")
+        return
+
     try:
         await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        if key is not None:
+            remember_render(key, signature)
         return
     except BadRequest as e:
+        if "message is not modified" in str(e).lower():
+            if key is not None:
+                remember_render(key, signature)
+            return
         logger.debug(f"edit_message_text failed: {e}; will fallback to reply_text")
     except Exception as e:
         logger.debug(f"edit_message_text exception: {e}; fallback to reply_text")
@@ -106,6 +325,212 @@ async def safe_edit_or_reply(query, text, reply_markup=None, parse_mode=None):
         pass
 
 
+# =====================================
+# CALLBACK COALESCING
+# =====================================
+# Klik beruntun pada pesan yang sama: klik identik yang masih diproses dibuang,
+# render per pesan diserialisasi, dan klik navigasi yang datang saat render
+# lain masih berjalan ditahan sebentar lalu di-drop jika tersusul klik lebih
+# baru. Klik pertama langsung dirender. Handler harus didaftarkan dengan
+# block=False.
+_callback_counter = itertools.count(1)  # nomor klik global, selalu naik
+_callback_generation = {}   # (chat_id, message_id) -> nomor klik terakhir
+_callback_inflight = set()  # (chat_id, message_id, data)
+_callback_locks = {}        # (chat_id, message_id) -> asyncio.Lock
+_callback_users = {}        # (chat_id, message_id) -> jumlah task pemakai lock
+
+def is_navigation_callback(data):
+    return data.startswith("list") or data.startswith("ep_page_")
+
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    key = message_key(query.message)
+    if key is None:
+        await handle_button(update, context)
+        return
+
+    inflight = key + (query.data,)
+    if inflight in _callback_inflight:
+        logger.debug(f"callback dropped (duplicate in flight): {query.data}")
+        return
+
+    generation = next(_callback_counter)
+    _callback_generation[key] = generation
+    _callback_inflight.add(inflight)
+    lock = _callback_locks.setdefault(key, asyncio.Lock())
+    _callback_users[key] = _callback_users.get(key, 0) + 1
+
+    try:
+        navigation = is_navigation_callback(query.data)
+        if navigation and lock.locked() and CALLBACK_DEBOUNCE > 0:
+            # Render lain masih berjalan: tunggu agar klik beruntun tergabung
+            await asyncio.sleep(CALLBACK_DEBOUNCE)
+
+        async with lock:
+            if navigation and _callback_generation.get(key) != generation:
+                logger.debug(f"callback dropped (superseded): {query.data}")
+                return
+            await handle_button(update, context)
+    finally:
+        _callback_inflight.discard(inflight)
+        _callback_users[key] -= 1
+        if not _callback_users[key]:
+            # Tidak ada task lain yang menunggu lock pesan ini
+            del _callback_users[key]
+            _callback_locks.pop(key, None)
+            _callback_generation.pop(key, None)
+
+
+# =====================================
+# TRACING & PROFILING (ADMIN)
+# =====================================
+# Saat tracing mati, biaya per update hanya satu cek bool dan satu
+# ContextVar.get(). Saat aktif, update yang tersampel mencatat span per
+# handler dan per request Bot API; update di atas SLOW_UPDATE_MS disimpan.
+tracing_enabled = False
+_current_trace = ContextVar('current_trace', default=None)
+_slow_updates = deque(maxlen=50)
+_profile_running = False
+
+# Entri idle event loop (select/epoll, _run_once) yang mendominasi profil
+PROFILE_IDLE_ENTRIES = re.compile(
+    r"[/\\]asyncio[/\\]|selectors\.py|"
+    r"'select\.(epoll|poll|kqueue|select)' objects|built-in method select\.select"
+)
+
+
+class UpdateTrace:
+    __slots__ = ("update_id", "started", "spans")
+
+    def __init__(self, update_id):
+        self.update_id = update_id
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add_span(self, name, started):
+        self.spans.append((name, (time.perf_counter() - started) * 1000))
+
+    def finish(self):
+        total_ms = (time.perf_counter() - self.started) * 1000
+        spans = ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.spans)
+        line = f"update {self.update_id} {total_ms:.0f}ms: {spans}"
+        if total_ms >= SLOW_UPDATE_MS:
+            _slow_updates.append((time.strftime('%H:%M:%S'), line))
+            logger.warning(f"[slow] {line}")
+        else:
+            logger.info(f"[trace] {line}")
+
+
+class TracedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest yang mencatat durasi tiap request Bot API ke trace aktif."""
+    async def do_request(self, url, method, *args, **kwargs):
+        trace = _current_trace.get()
+        if trace is None:
+            return await super().do_request(url, method, *args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            trace.add_span(f"api:{url.rsplit('/', 1)[-1]}", started)
+
+
+async def begin_update_trace(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Update diproses berurutan di task yang sama, jadi trace lama harus direset
+    if tracing_enabled and random.random() < TRACE_SAMPLE_RATE:
+        _current_trace.set(UpdateTrace(update.update_id))
+    elif _current_trace.get() is not None:
+        _current_trace.set(None)
+
+def toggle_tracing():
+    global tracing_enabled
+    tracing_enabled = not tracing_enabled
+    return tracing_enabled
+
+def start_profile(context: ContextTypes.DEFAULT_TYPE, chat_id):
+    """Mulai satu capture cProfile di background. False jika sudah berjalan."""
+    global _profile_running
+    if _profile_running:
+        return False
+    _profile_running = True
+    context.application.create_task(run_profile(context, chat_id, PROFILE_SECONDS))
+    return True
+
+def traced(handler):
+    """Bungkus handler utama: catat span handler lalu tutup trace update."""
+    @wraps(handler)
+    async def wrapper(update, context):
+        trace = _current_trace.get()
+        if trace is None:
+            return await handler(update, context)
+
+        started = time.perf_counter()
+        try:
+            return await handler(update, context)
+        finally:
+            trace.add_span(handler.__name__, started)
+            trace.finish()
+    return wrapper
+
+async def run_profile(context: ContextTypes.DEFAULT_TYPE, chat_id, seconds):
+    """cProfile selama `seconds` detik di thread event loop, kirim top fungsi."""
+    global _profile_running
+    import cProfile
+    import io
+    import pstats
+
+    # Task ini menyalin context handler; send_message nanti bukan bagian update itu
+    _current_trace.set(None)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        _profile_running = False
+
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    # Buang waktu idle loop supaya yang tampil adalah waktu handler sendiri
+    for func in list(stats.stats):
+        filename, _, name = func
+        if PROFILE_IDLE_ENTRIES.search(f"{filename}:{name}"):
+            del stats.stats[func]
+    stats.strip_dirs().sort_stats('tottime').print_stats(15)
+    report = out.getvalue().strip()
+    report = report[report.find("ncalls"):] if "ncalls" in report else report
+
+    await context.bot.send_message(
+        chat_id,
+        f"⏱ *Profil {seconds} detik*\n```\n{report[:3500]}\n```",
+        parse_mode='Markdown'
+    )
+
+def build_profiling_menu():
+    profiling_text = (
+        "🩺 *Profiling*\n\n"
+        "━━━━━━━━━━━━━━━━━━━━\n"
+        f"📡 Tracing: {'ON' if tracing_enabled else 'OFF'}\n"
+        f"🎯 Sample rate: {TRACE_SAMPLE_RATE:.0%}\n"
+        f"🐢 Batas lambat: {SLOW_UPDATE_MS:.0f} ms\n"
+        f"📋 Update lambat tercatat: {len(_slow_updates)}\n"
+        f"⏱ Profiler: {'berjalan' if _profile_running else 'siap'}"
+    )
+    keyboard = [
+        [InlineKeyboardButton(
+            "⏹ Matikan Tracing" if tracing_enabled else "▶️ Aktifkan Tracing",
+            callback_data='trace_toggle'
+        )],
+        [InlineKeyboardButton("🐢 Update Lambat", callback_data='trace_slow')],
+        [InlineKeyboardButton(f"⏱ Profil {PROFILE_SECONDS} detik", callback_data='profile_start')],
+        [InlineKeyboardButton("« Admin Panel", callback_data="admin_panel")]
+    ]
+    return profiling_text, InlineKeyboardMarkup(keyboard)
+
+
 # =====================================
 # START MENU (AUTO ADMIN FILTER)
 # =====================================
@@ -120,15 +545,20 @@ def build_start_keyboard(is_admin_user: bool):
     return InlineKeyboardMarkup(keyboard)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Deep link: /start d_<id> atau /start ep_<id>_<n>
+    if context.args and await open_deep_link(update, context, context.args[0]):
+        return
+
     user_id = update.message.from_user.id
     kb = build_start_keyboard(is_admin(user_id))
+    catalog = get_catalog()
     
     welcome_text = (
         "🎬 *Selamat Datang di DSeriesHub!*\n\n"
         "━━━━━━━━━━━━━━━━━━━━\n"
         "Bot ini menyediakan koleksi drama Cina lengkap yang bisa kamu tonton kapan saja!\n\n"
-        f"📊 *Total Drama:* {len(drama_database)}\n"
-        f"🎥 *Total Episode:* {sum(len(d.get('episodes', {})) for d in drama_database.values())}\n\n"
+        f"📊 *Total Drama:* {len(catalog)}\n"
+        f"🎥 *Total Episode:* {sum(len(d.get('episodes', {})) for d in catalog.values())}\n\n"
         "━━━━━━━━━━━━━━━━━━━━\n"
         "Pilih menu di bawah untuk mulai:"
     )
@@ -140,6 +570,107 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+# =====================================
+# DEEP LINK (/start PAYLOAD)
+# =====================================
+# Payload /start hanya boleh [A-Za-z0-9_-] maks 64 karakter. ID drama yang
+# aman dipakai langsung; selain itu pakai shortlink "-<hash>" yang dihitung
+# deterministik dari ID, jadi tabelnya cukup dibangun ulang dari snapshot.
+DEEP_LINK_SAFE_ID = re.compile(r'[A-Za-z0-9]{1,40}')
+DEEP_LINK_MAX_LEN = 64
+_shortlink_cache = (None, {})
+
+def shortlink_code(did):
+    return hashlib.sha1(did.encode('utf-8')).hexdigest()[:10]
+
+def shortlink_table(catalog):
+    """Tabel shortlink -> ID drama, di-cache per snapshot katalog."""
+    global _shortlink_cache
+    if _shortlink_cache[0] is not catalog:
+        _shortlink_cache = (catalog, {shortlink_code(did): did for did in catalog})
+    return _shortlink_cache[1]
+
+def drama_ref(did):
+    if DEEP_LINK_SAFE_ID.fullmatch(did):
+        return did
+    return f"-{shortlink_code(did)}"
+
+def resolve_drama_ref(ref, catalog):
+    if ref.startswith("-"):
+        return shortlink_table(catalog).get(ref[1:])
+    return ref
+
+def build_deep_link_payload(did, ep=None):
+    """Payload /start <= 64 karakter; pakai shortlink lalu fallback ke d_ jika perlu."""
+    drama_payload = f"d_{drama_ref(did)}"  # selalu muat: ref maks 40 karakter
+    if ep is None or not DEEP_LINK_SAFE_ID.fullmatch(ep):
+        return drama_payload
+
+    for ref in (drama_ref(did), f"-{shortlink_code(did)}"):
+        payload = f"ep_{ref}_{ep}"
+        if len(payload) <= DEEP_LINK_MAX_LEN:
+            return payload
+    return drama_payload
+
+def build_share_url(bot, title, did, ep=None):
+    """URL share Telegram untuk deep link drama/episode, None jika tidak tersedia."""
+    if not bot.username:
+        return None
+    link = f"https://t.me/{bot.username}?start={build_deep_link_payload(did, ep)}"
+    text = f"🎬 {title}" + (f" - Episode {ep}" if ep is not None else "")
+    return f"https://t.me/share/url?url={quote(link, safe='')}&text={quote(text, safe='')}"
+
+
+class _DeepLinkMessage:
+    """Proxy pesan /start: reply diteruskan, delete diabaikan."""
+    def __init__(self, message):
+        self._message = message
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+    async def delete(self):
+        return True
+
+
+class DeepLinkQuery:
+    """Adapter supaya show_episodes/send_episode bisa dipanggil dari /start."""
+    def __init__(self, message):
+        self.message = _DeepLinkMessage(message)
+
+    def get_bot(self):
+        return self.message.get_bot()
+
+    async def edit_message_text(self, text, reply_markup=None, parse_mode=None):
+        # Pesan user tidak bisa diedit bot, jadi kirim pesan baru
+        return await self.message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+
+
+async def open_deep_link(update: Update, context: ContextTypes.DEFAULT_TYPE, payload):
+    """Arahkan payload /start ke halaman drama/episode. False jika payload tidak dikenal."""
+    catalog = get_catalog()
+    query = DeepLinkQuery(update.message)
+
+    if payload.startswith("d_"):
+        did = resolve_drama_ref(payload[2:], catalog)
+        if not did:
+            return False
+        await show_episodes(query, did)
+        return True
+
+    if payload.startswith("ep_"):
+        parts = payload[3:].rsplit("_", 1)
+        if len(parts) != 2:
+            return False
+        did = resolve_drama_ref(parts[0], catalog)
+        if not did:
+            return False
+        await send_episode(query, did, parts[1], context)
+        return True
+
+    return False
+
+
 # =====================================
 # INDEX FORWARD SYSTEM
 # =====================================
@@ -174,8 +705,6 @@ async def index_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def parse_and_index_message(message, context):
-    global drama_database
-
     try:
         caption = message.caption or ""
 
@@ -191,25 +720,28 @@ async def parse_and_index_message(message, context):
             title = title_ep[0].strip()
             ep = title_ep[1].strip()
 
-            # Check if drama exists
-            is_new_drama = drama_id not in drama_database
-            
-            if is_new_drama:
-                drama_database[drama_id] = {"title": title, "episodes": {}}
+            # Check if drama exists (pada snapshot aktif)
+            catalog = get_catalog()
+            is_new_drama = drama_id not in catalog
 
             # Check if episode already exists
-            is_update = ep in drama_database[drama_id]["episodes"]
-            
-            drama_database[drama_id]["episodes"][ep] = {
-                "file_id": message.video.file_id
-            }
+            is_update = not is_new_drama and ep in catalog[drama_id]["episodes"]
+
+            # Copy-on-write: snapshot lama tidak disentuh
+            catalog = update_drama(
+                drama_id,
+                title=title if is_new_drama else None,
+                episode=ep,
+                file_id=message.video.file_id
+            )
+            mark_catalog_dirty()
 
             # Get video info
             video = message.video
             duration = f"{video.duration // 60}:{video.duration % 60:02d}" if video.duration else "N/A"
             file_size = f"{video.file_size / (1024*1024):.2f} MB" if video.file_size else "N/A"
             
-            total_eps = len(drama_database[drama_id]["episodes"])
+            total_eps = len(catalog[drama_id]["episodes"])
             
             logger.info(f"Indexed: {drama_id} - {title} EP {ep}")
             
@@ -246,22 +778,24 @@ async def parse_and_index_message(message, context):
             drama_id = parts[0][1:]
             title = parts[1].strip() if len(parts) > 1 else "Unknown"
 
-            # Check if drama exists
-            is_new_drama = drama_id not in drama_database
-            has_old_thumbnail = not is_new_drama and "thumbnail" in drama_database[drama_id]
-            
-            if is_new_drama:
-                drama_database[drama_id] = {"title": title, "episodes": {}}
+            # Check if drama exists (pada snapshot aktif)
+            catalog = get_catalog()
+            is_new_drama = drama_id not in catalog
+            has_old_thumbnail = not is_new_drama and "thumbnail" in catalog[drama_id]
 
-            drama_database[drama_id]["thumbnail"] = message.photo[-1].file_id
-            drama_database[drama_id]["title"] = title
+            catalog = update_drama(
+                drama_id,
+                title=title,
+                thumbnail=message.photo[-1].file_id
+            )
+            mark_catalog_dirty()
 
             # Get photo info
             photo = message.photo[-1]
             resolution = f"{photo.width}x{photo.height}"
             file_size = f"{photo.file_size / 1024:.2f} KB" if photo.file_size else "N/A"
             
-            total_eps = len(drama_database[drama_id].get("episodes", {}))
+            total_eps = len(catalog[drama_id].get("episodes", {}))
             
             logger.info(f"Indexed thumbnail: {drama_id} - {title}")
             
@@ -308,10 +842,12 @@ def paginate_items(items, page, items_per_page=10):
 # =====================================
 # CALLBACK BUTTONS
 # =====================================
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     user_id = query.from_user.id
-    await query.answer()
+
+    # Pin snapshot katalog untuk seluruh request ini
+    catalog = get_catalog()
 
     # ============================
     # MENU UTAMA (BACK)
@@ -321,8 +857,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         welcome_text = (
             "🎬 *Bot DSeriesHub*\n\n"
             "━━━━━━━━━━━━━━━━━━━━\n"
-            f"📊 Total Drama: {len(drama_database)}\n"
-            f"🎥 Total Episode: {sum(len(d.get('episodes', {})) for d in drama_database.values())}\n\n"
+            f"📊 Total Drama: {len(catalog)}\n"
+            f"🎥 Total Episode: {sum(len(d.get('episodes', {})) for d in catalog.values())}\n\n"
             "Pilih menu:"
         )
         await safe_edit_or_reply(query, welcome_text, reply_markup=kb, parse_mode='Markdown')
@@ -386,14 +922,16 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         admin_text = (
             "⚙️ *Admin Panel*\n\n"
             "━━━━━━━━━━━━━━━━━━━━\n"
-            f"📊 Total Drama: {len(drama_database)}\n"
-            f"🎥 Total Episode: {sum(len(d.get('episodes', {})) for d in drama_database.values())}\n\n"
+            f"📊 Total Drama: {len(catalog)}\n"
+            f"🎥 Total Episode: {sum(len(d.get('episodes', {})) for d in catalog.values())}\n\n"
             "Pilih aksi:"
         )
         keyboard = [
             [InlineKeyboardButton("➕ Upload Drama", callback_data='upload')],
             [InlineKeyboardButton("🔄 Reload Database", callback_data='reload')],
+            [InlineKeyboardButton("💾 Export Snapshot", callback_data='export')],
             [InlineKeyboardButton("📋 Statistik", callback_data='stats')],
+            [InlineKeyboardButton("🩺 Profiling", callback_data='profiling')],
             [InlineKeyboardButton("« Kembali", callback_data="back")]
         ]
         await safe_edit_or_reply(query, admin_text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
@@ -407,7 +945,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if "_" in query.data:
             page = int(query.data.split("_")[1])
         
-        if not drama_database:
+        if not catalog:
             await safe_edit_or_reply(
                 query, 
                 "📭 *Belum Ada Drama*\n\n━━━━━━━━━━━━━━━━━━━━\nDatabase masih kosong.", 
@@ -417,7 +955,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         # Sort drama by title
-        sorted_dramas = sorted(drama_database.items(), key=lambda x: x[1].get("title", ""))
+        sorted_dramas = sorted(catalog.items(), key=lambda x: x[1].get("title", ""))
         page_items, total = paginate_items(sorted_dramas, page, items_per_page=8)
         
         keyboard = []
@@ -483,12 +1021,48 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         kb = InlineKeyboardMarkup([[InlineKeyboardButton("« Admin Panel", callback_data="admin_panel")]])
-        await safe_edit_or_reply(
-            query, 
-            "🔄 *Reload Database*\n\n━━━━━━━━━━━━━━━━━━━━\nReload tidak diperlukan.\nGunakan sistem forward untuk indexing otomatis.", 
-            parse_mode='Markdown',
-            reply_markup=kb
-        )
+
+        # Tulis dulu perubahan yang belum tersimpan, supaya reload tidak
+        # menimpa episode yang baru diindex dengan file lama
+        await flush_catalog()
+
+        # Bulk import dari file snapshot: dibangun terpisah lalu di-swap sekaligus
+        if CATALOG_SNAPSHOT_PATH and os.path.exists(CATALOG_SNAPSHOT_PATH):
+            try:
+                new_catalog = swap_catalog(await asyncio.to_thread(load_catalog_file))
+                reload_text = (
+                    "🔄 *Reload Database*\n\n━━━━━━━━━━━━━━━━━━━━\n"
+                    f"✅ Snapshot dimuat ulang.\n"
+                    f"📺 Total Drama: {len(new_catalog)}\n"
+                    f"🎥 Total Episode: {sum(len(d.get('episodes', {})) for d in new_catalog.values())}"
+                )
+            except Exception as e:
+                logger.error(f"reload snapshot failed: {e}")
+                reload_text = "🔄 *Reload Database*\n\n━━━━━━━━━━━━━━━━━━━━\n❌ Gagal memuat snapshot. Database lama tetap dipakai."
+        else:
+            reload_text = "🔄 *Reload Database*\n\n━━━━━━━━━━━━━━━━━━━━\nBelum ada file snapshot.\nGunakan sistem forward untuk indexing otomatis."
+
+        await safe_edit_or_reply(query, reload_text, parse_mode='Markdown', reply_markup=kb)
+        return
+
+    if query.data == "export":
+        if not is_admin(user_id):
+            await safe_edit_or_reply(query, "❌ Hanya admin")
+            return
+
+        # Disk Render bersifat sementara, jadi snapshot dikirim ke chat admin
+        # langsung dari memori (tidak bergantung CATALOG_SNAPSHOT_PATH).
+        # Kirim balik file ini ke bot untuk restore.
+        try:
+            data = await asyncio.to_thread(dump_catalog, catalog)
+            await query.message.reply_document(
+                document=data,
+                filename=SNAPSHOT_FILENAME,
+                caption=f"💾 Snapshot katalog: {len(catalog)} drama\nKirim file ini ke bot untuk restore."
+            )
+        except Exception as e:
+            logger.error(f"export snapshot failed: {e}")
+            await safe_edit_or_reply(query, "❌ Gagal membuat snapshot.")
         return
 
     if query.data == "stats":
@@ -496,23 +1070,23 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await safe_edit_or_reply(query, "❌ Hanya admin")
             return
 
-        total_eps = sum(len(d.get('episodes', {})) for d in drama_database.values())
-        dramas_with_thumb = sum(1 for d in drama_database.values() if 'thumbnail' in d)
+        total_eps = sum(len(d.get('episodes', {})) for d in catalog.values())
+        dramas_with_thumb = sum(1 for d in catalog.values() if 'thumbnail' in d)
         
         stats_text = (
             "📋 *Statistik Database*\n\n"
             "━━━━━━━━━━━━━━━━━━━━\n"
-            f"📺 Total Drama: {len(drama_database)}\n"
+            f"📺 Total Drama: {len(catalog)}\n"
             f"🎥 Total Episode: {total_eps}\n"
             f"🖼 Drama dengan Thumbnail: {dramas_with_thumb}\n"
-            f"📊 Rata-rata EP/Drama: {total_eps // len(drama_database) if drama_database else 0}\n\n"
+            f"📊 Rata-rata EP/Drama: {total_eps // len(catalog) if catalog else 0}\n\n"
             "━━━━━━━━━━━━━━━━━━━━\n"
             "*Top 5 Drama (Episode Terbanyak):*\n"
         )
         
         # Top 5 drama
         top_dramas = sorted(
-            drama_database.items(), 
+            catalog.items(), 
             key=lambda x: len(x[1].get('episodes', {})), 
             reverse=True
         )[:5]
@@ -524,6 +1098,35 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await safe_edit_or_reply(query, stats_text, parse_mode='Markdown', reply_markup=kb)
         return
 
+    # ============================
+    # PROFILING (ADMIN)
+    # ============================
+    if query.data in ("profiling", "trace_toggle", "trace_slow", "profile_start"):
+        if not is_admin(user_id):
+            await safe_edit_or_reply(query, "❌ Hanya admin")
+            return
+
+        if query.data == "trace_toggle":
+            enabled = toggle_tracing()
+            logger.info(f"Tracing {'enabled' if enabled else 'disabled'} by {user_id}")
+
+        if query.data == "trace_slow":
+            kb = InlineKeyboardMarkup([[InlineKeyboardButton("« Profiling", callback_data="profiling")]])
+            if _slow_updates:
+                lines = "\n".join(f"{ts} {line}" for ts, line in list(_slow_updates)[-10:])
+                slow_text = f"🐢 *Update Lambat* (>{SLOW_UPDATE_MS:.0f} ms)\n```\n{lines[:3500]}\n```"
+            else:
+                slow_text = "🐢 *Update Lambat*\n\n━━━━━━━━━━━━━━━━━━━━\nBelum ada update lambat tercatat."
+            await safe_edit_or_reply(query, slow_text, reply_markup=kb, parse_mode='Markdown')
+            return
+
+        if query.data == "profile_start":
+            start_profile(context, query.message.chat_id)
+
+        profiling_text, kb = build_profiling_menu()
+        await safe_edit_or_reply(query, profiling_text, reply_markup=kb, parse_mode='Markdown')
+        return
+
     # ============================
     # PILIH DRAMA
     # ============================
@@ -551,7 +1154,8 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # SHOW EPISODES (dengan pagination)
 # =====================================
 async def show_episodes(query, did, page=0):
-    if did not in drama_database:
+    catalog = get_catalog()
+    if did not in catalog:
         await safe_edit_or_reply(
             query, 
             "❌ Drama tidak ditemukan.", 
@@ -559,7 +1163,7 @@ async def show_episodes(query, did, page=0):
         )
         return
 
-    info = drama_database[did]
+    info = catalog[did]
     eps = info.get("episodes", {})
     
     # Sort episodes
@@ -589,6 +1193,11 @@ async def show_episodes(query, did, page=0):
         nav_buttons.append(InlineKeyboardButton("➡️", callback_data=f"ep_page_{did}_{page+1}"))
     
     keyboard.append(nav_buttons)
+
+    share_url = build_share_url(query.get_bot(), info.get('title', did), did)
+    if share_url:
+        keyboard.append([InlineKeyboardButton("🔗 Bagikan Drama", url=share_url)])
+
     keyboard.append([InlineKeyboardButton("« Daftar Drama", callback_data="list")])
     kb = InlineKeyboardMarkup(keyboard)
 
@@ -625,7 +1234,8 @@ async def show_episodes(query, did, page=0):
 # SEND EPISODE
 # =====================================
 async def send_episode(query, did, ep, context):
-    info = drama_database.get(did)
+    catalog = get_catalog()
+    info = catalog.get(did)
     if not info or "episodes" not in info or ep not in info["episodes"]:
         await safe_edit_or_reply(
             query, 
@@ -660,6 +1270,10 @@ async def send_episode(query, did, ep, context):
     if next_ep and next_ep in info["episodes"]:
         keyboard.append([InlineKeyboardButton(f"▶️ Episode {next_ep}", callback_data=f"ep_{did}_{next_ep}")])
     
+    share_url = build_share_url(query.get_bot(), info.get('title', did), did, ep)
+    if share_url:
+        keyboard.append([InlineKeyboardButton("🔗 Bagikan Episode", url=share_url)])
+
     keyboard.append([InlineKeyboardButton("📺 Daftar Episode", callback_data=f"d_{did}")])
     keyboard.append([InlineKeyboardButton("🏠 Menu Utama", callback_data="back")])
     kb = InlineKeyboardMarkup(keyboard)
@@ -670,6 +1284,44 @@ async def send_episode(query, did, ep, context):
         logger.error(f"reply_text navigation failed: {e}")
 
 
+# =====================================
+# RESTORE SNAPSHOT (ADMIN)
+# =====================================
+async def restore_snapshot(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    msg = update.message
+
+    if not is_admin(msg.from_user.id):
+        await msg.reply_text("❌ Hanya admin yang boleh restore database.")
+        return
+
+    tmp_path = f"{CATALOG_SNAPSHOT_PATH or SNAPSHOT_FILENAME}.upload"
+    try:
+        tg_file = await msg.document.get_file()
+        await tg_file.download_to_drive(tmp_path)
+        new_catalog = await asyncio.to_thread(load_catalog_file, tmp_path)
+    except Exception as e:
+        logger.error(f"restore_snapshot failed: {e}")
+        await msg.reply_text("❌ File snapshot tidak valid. Database lama tetap dipakai.")
+        return
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    swap_catalog(new_catalog)
+    mark_catalog_dirty()
+    logger.info(f"Catalog restored: {len(new_catalog)} dramas")
+
+    await msg.reply_text(
+        "✅ *Database Dipulihkan*\n\n"
+        "━━━━━━━━━━━━━━━━━━━━\n"
+        f"📺 Total Drama: {len(new_catalog)}\n"
+        f"🎥 Total Episode: {sum(len(d.get('episodes', {})) for d in new_catalog.values())}",
+        parse_mode='Markdown'
+    )
+
+
 # =====================================
 # USER MESSAGE HANDLER
 # =====================================
@@ -685,6 +1337,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await index_message(update, context)
         return
 
+    # SNAPSHOT FILE → RESTORE (ADMIN)
+    if msg.document and (msg.document.file_name or "").endswith(".json.gz"):
+        await restore_snapshot(update, context)
+        return
+
     # SEARCH MODE
     if context.user_data.get("waiting") == "search":
         text = (msg.text or "").strip()
@@ -693,9 +1350,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         query_lower = text.lower()
+        catalog = get_catalog()
         results = [
             (did, info["title"])
-            for did, info in drama_database.items()
+            for did, info in catalog.items()
             if query_lower in info.get("title", "").lower()
         ]
 
@@ -717,7 +1375,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             keyboard = []
             for did, title in results:
-                ep_count = len(drama_database[did].get("episodes", {}))
+                ep_count = len(catalog[did].get("episodes", {}))
                 keyboard.append([InlineKeyboardButton(
                     f"🎬 {title} ({ep_count} EP)", 
                     callback_data=f"d_{did}"
@@ -744,13 +1402,54 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # =====================================
 # SET BOT COMMANDS
 # =====================================
+BOT_COMMANDS = [
+    ("start", "Mulai bot dan tampilkan menu utama"),
+]
+_command_sync_task = None
+
+async def sync_bot_commands(application: Application):
+    """Set bot commands hanya jika berbeda dari yang sudah terdaftar"""
+    from telegram import BotCommand
+
+    try:
+        current = await application.bot.get_my_commands()
+        if [(c.command, c.description) for c in current] == BOT_COMMANDS:
+            logger.info("Bot commands unchanged, skip set_my_commands")
+            return
+        await application.bot.set_my_commands([BotCommand(c, d) for c, d in BOT_COMMANDS])
+        logger.info("Bot commands set successfully")
+    except Exception as e:
+        logger.warning(f"sync_bot_commands failed: {e}")
+
 async def post_init(application: Application):
-    """Set bot commands after initialization"""
-    commands = [
-        BotCommand("start", "Mulai bot dan tampilkan menu utama")
-    ]
-    await application.bot.set_my_commands(commands)
-    logger.info("Bot commands set successfully")
+    """Jalankan sinkronisasi command di background agar tidak menahan polling"""
+    global _command_sync_task
+    # Application belum running di sini, jadi task dibuat langsung di loop
+    # dan disimpan supaya bisa dibatalkan saat shutdown
+    _command_sync_task = asyncio.get_running_loop().create_task(sync_bot_commands(application))
+    mark_startup("post_init selesai")
+
+async def post_shutdown(application: Application):
+    """Hentikan sinkronisasi command dan simpan perubahan katalog yang tertunda"""
+    if _command_sync_task is not None and not _command_sync_task.done():
+        _command_sync_task.cancel()
+        try:
+            await _command_sync_task
+        except asyncio.CancelledError:
+            pass
+    await flush_catalog()
+
+
+# =====================================
+# FIRST UPDATE (STARTUP TIMELINE)
+# =====================================
+_first_update_seen = False
+
+async def mark_first_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    global _first_update_seen
+    if not _first_update_seen:
+        _first_update_seen = True
+        mark_startup("update pertama diterima")
 
 
 # =====================================
@@ -759,11 +1458,24 @@ async def post_init(application: Application):
 def main():
     Thread(target=run_flask, daemon=True).start()
 
-    app_bot = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
+    # Prewarm katalog di background; akses pertama tetap aman lewat get_catalog
+    Thread(target=load_catalog_lazily, daemon=True).start()
+
+    app_bot = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .request(TracedHTTPXRequest(connection_pool_size=256))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    mark_startup("application dibuat")
 
-    app_bot.add_handler(CommandHandler("start", start))
-    app_bot.add_handler(CallbackQueryHandler(button_handler))
-    app_bot.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, handle_message))
+    app_bot.add_handler(TypeHandler(Update, begin_update_trace), group=-2)
+    app_bot.add_handler(TypeHandler(Update, mark_first_update), group=-1)
+    app_bot.add_handler(CommandHandler("start", traced(start)))
+    app_bot.add_handler(CallbackQueryHandler(traced(button_handler), block=False))
+    app_bot.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, traced(handle_message)))
 
     logger.info("Bot berjalan...")
     app_bot.run_polling()